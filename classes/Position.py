@@ -1,7 +1,7 @@
 import dataclasses
 from typing import Optional
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Position:
     quantity: float
     underlying: Optional[str] = None
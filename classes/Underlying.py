@@ -1,6 +1,6 @@
 import dataclasses
 from typing import Optional
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Underlying:
     isin: Optional[str] = None
\ No newline at end of file
@@ -1,11 +1,10 @@
 import dataclasses
-from typing import Optional, List
+from typing import Optional, Tuple
 
 from classes.Position import Position
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class Wikifolio:
-    wikifolioStatus = str
     cashAccountCurrentBalance: float
     totalValue: float
     wikifolioSymbol: Optional[str] = None
@@ -13,4 +12,5 @@ class Wikifolio:
     askPrice: Optional[float] = None
     priceDate: Optional[str] = None
     baseCurrency: Optional[str] = None
-    positions: List[Position] = dataclasses.field(default_factory=list)
\ No newline at end of file
+    wikifolioStatus: Optional[str] = None
+    positions: Tuple[Position, ...] = ()
\ No newline at end of file
@@ -1,7 +1,7 @@
 import dataclasses
 from typing import Optional
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True, frozen=True)
 class WikifolioListItem:
     wikifolioSymbol: Optional[str] = None
     resourceLink: Optional[str] = None
\ No newline at end of file
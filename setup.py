@@ -2,14 +2,19 @@ from setuptools import setup
 
 setup(
     name='wikifolioTradingAPI',
-    version='1.0.0',
+    version='2.0.0',
     description='Wikifolio Trading API Wrapper',
     author='henrydatei',
     author_email='henrydatei@web.de',
     url='https://github.com/henrydatei/wikifolio-trading-api',
     packages=['wikifolioTradingAPI'],
+    python_requires='>=3.10',
     install_requires=[
         "requests",
-        "dacite"
+        "cattrs",
+        "orjson",
+        "cachetools",
+        "httpx[http2]",
+        "brotli"
     ],
 )
\ No newline at end of file
@@ -1 +1,2 @@
-from .wikifolio import WikifolioTradingAPI
\ No newline at end of file
+from .wikifolio import WikifolioTradingAPI, OrderStatus
+from .async_wikifolio import AsyncWikifolioTradingAPI
\ No newline at end of file
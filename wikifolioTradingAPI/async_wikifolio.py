@@ -0,0 +1,135 @@
+import asyncio
+import dataclasses
+import httpx
+from typing import List, Optional
+import orjson
+import logging
+import coloredlogs
+
+from .converter import converter
+from .wikifolio import OrderStatus, _order_params
+from classes.WikifolioListItem import WikifolioListItem
+from classes.Underlying import Underlying
+from classes.OrderStatusResponse import OrderStatusResponse
+
+logger = logging.getLogger(__name__)
+coloredlogs.install(level='DEBUG', logger=logger, fmt='[%(asctime)s] %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+@dataclasses.dataclass
+class AsyncWikifolioTradingAPI():
+    """Async variant of WikifolioTradingAPI for the paginated endpoints
+
+    Use it as an async context manager, which logs in on enter and logs out on exit:
+
+        async with AsyncWikifolioTradingAPI(clientApiKey, userApiKey) as wf_api:
+            orders = await wf_api.list_wikifolio_orders('wf0spc2022')
+    """
+    clientApiKey: str
+    userApiKey: str
+    
+    def __post_init__(self) -> None:
+        self.client = httpx.AsyncClient(
+            http2=True,
+            headers={'accept': 'application/json', 'Accept-Encoding': 'gzip, br'},
+            limits=httpx.Limits(max_connections=20)
+        )
+    
+    async def __aenter__(self) -> 'AsyncWikifolioTradingAPI':
+        try:
+            await self.login()
+        except BaseException:
+            # __aexit__ doesn't run when entering fails, so close the client here
+            await self.client.aclose()
+            raise
+        return self
+    
+    async def __aexit__(self, *args) -> None:
+        await self.logout()
+    
+    async def login(self) -> None:
+        """Login
+        """
+        headers = {
+            'clientApiKey': self.clientApiKey,
+            'userApiKey': self.userApiKey
+        }
+        logger.info('Getting session token')
+        r = await self.client.post('https://trading-api.wikifolio.com/v1/sessions', headers=headers)
+        r.raise_for_status()
+        self.sessionToken = orjson.loads(r.content)['sessionToken']
+        logger.debug('Session token: %s', self.sessionToken)
+        self.client.headers['sessionToken'] = self.sessionToken
+    
+    async def logout(self) -> None:
+        """Logout
+        """
+        logger.info('Logging out')
+        try:
+            r = await self.client.delete('https://trading-api.wikifolio.com/v1/sessions')
+            r.raise_for_status()
+        finally:
+            await self.client.aclose()
+        logger.info('Logged out')
+    
+    async def _paginate(self, url: str, data_class: type, description: str, params: Optional[dict] = None) -> list:
+        """Fetch all pages of a paginated endpoint
+
+        The first page is fetched on its own to learn the number of pages, the remaining pages are fetched concurrently on the event loop.
+
+        Args:
+            url (str): The endpoint URL
+            data_class (type): The dataclass to convert each result to
+            description (str): What is being fetched, used for logging
+            params (Optional[dict]): Additional query parameters. Defaults to None.
+
+        Returns:
+            list: A list of data_class instances
+        """
+        params = params or {}
+        logger.info('Getting %s, page 1', description)
+        r = await self.client.get(url, params={**params, 'pageNumber': 1})
+        r.raise_for_status()
+        body = orjson.loads(r.content)
+        totalPages = body['totalPages']
+        logger.info('Found %d pages of %s', totalPages, description)
+        logger.info('Found %d %s on page 1', len(body['results']), description)
+        results = body['results']
+        responses = await asyncio.gather(*[self.client.get(url, params={**params, 'pageNumber': pageNumber}) for pageNumber in range(2, totalPages + 1)])
+        for pageNumber, r in enumerate(responses, start=2):
+            r.raise_for_status()
+            page = orjson.loads(r.content)['results']
+            logger.info('Found %d %s on page %d', len(page), description, pageNumber)
+            results.extend(page)
+        
+        return converter.structure(results, List[data_class])
+    
+    async def list_wikifolios(self) -> List[WikifolioListItem]:
+        """List wikifolios
+
+        Returns:
+            List[WikifolioListItem]: A list of wikifolios
+        """
+        return await self._paginate('https://trading-api.wikifolio.com/v1/wikifolios', WikifolioListItem, 'wikifolios')
+    
+    async def list_wikifolio_underlyings(self, wikifolioSymbol: str) -> List[Underlying]:
+        """List underlyings for a wikifolio
+
+        Args:
+            wikifolioSymbol (str): The wikifolio symbol
+
+        Returns:
+            List[Underlying]: A list of underlyings
+        """
+        return await self._paginate(f'https://trading-api.wikifolio.com/v1/wikifolios/{wikifolioSymbol}/underlyings', Underlying, f'underlyings for {wikifolioSymbol}')
+    
+    async def list_wikifolio_orders(self, wikifolioSymbol: str, status: Optional[OrderStatus] = None) -> List[OrderStatusResponse]:
+        """List orders for a wikifolio
+
+        Args:
+            wikifolioSymbol (str): The wikifolio symbol
+            status (Optional[OrderStatus]): The order status to filter by. Defaults to None. Possible values: 'Inactive', 'Waiting', 'Active', 'Evaluating', 'Executing', 'RequestingExecutionInformation', 'PartiallyExecutedActive', 'Executed', 'PartiallyExecutedExecuted', 'Deleted', 'DeleteRequested', 'Updated', 'Obsolete', 'Error', 'Rejected', 'Undone', 'Abandoned'
+
+        Returns:
+            List[OrderStatusResponse]: A list of orders
+        """
+        return await self._paginate(f'https://trading-api.wikifolio.com/v1/wikifolios/{wikifolioSymbol}/orders', OrderStatusResponse, f'orders for {wikifolioSymbol}', _order_params(status))
@@ -0,0 +1,39 @@
+import cattrs
+from cattrs.gen import make_dict_structure_fn
+
+from classes.Position import Position
+from classes.Wikifolio import Wikifolio
+from classes.WikifolioListItem import WikifolioListItem
+from classes.Underlying import Underlying
+from classes.OrderStatusResponse import OrderStatusResponse
+
+# cattrs generates the structuring function for each class once, so converting responses doesn't need reflection per item.
+# Detailed validation is off so the generated functions skip per-field error bookkeeping; type errors from the strict hooks below still
+# raise, just as the first failing field's TypeError instead of a ClassValidationError listing every field.
+converter = cattrs.Converter(detailed_validation=False)
+
+def _structure_str(value, _) -> str:
+    # cattrs would call str() on anything, turning a missing value into 'None'
+    if not isinstance(value, str):
+        raise TypeError(f'Expected str, got {type(value).__name__}: {value!r}')
+    return value
+
+def _structure_int(value, _) -> int:
+    # cattrs would call int() on anything, truncating 1.9 to 1 and parsing '7'
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise TypeError(f'Expected int, got {type(value).__name__}: {value!r}')
+    return value
+
+def _structure_float(value, _) -> float:
+    # JSON has no separate integer type, so whole numbers are accepted, but strings like '1.5' are not
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        raise TypeError(f'Expected float, got {type(value).__name__}: {value!r}')
+    return float(value)
+
+# Strict scalar hooks so malformed payloads raise instead of being coerced, as they did with dacite (which also rejected ints for float fields).
+# They are registered before the dataclass hooks, which look up their field hooks when they are generated.
+converter.register_structure_hook(str, _structure_str)
+converter.register_structure_hook(int, _structure_int)
+converter.register_structure_hook(float, _structure_float)
+for data_class in [Position, Wikifolio, WikifolioListItem, Underlying, OrderStatusResponse]:
+    converter.register_structure_hook(data_class, make_dict_structure_fn(data_class, converter))
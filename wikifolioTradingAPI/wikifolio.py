@@ -1,11 +1,19 @@
 import dataclasses
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
+import threading
+from urllib.parse import urlencode
+from cachetools import TTLCache
 import requests
-from dacite import from_dict
-from typing import List, Optional, Tuple
+from requests.adapters import HTTPAdapter
+from typing import List, Literal, Optional, Tuple, get_args
+import orjson
 import logging
 import coloredlogs
 import datetime
 
+from .converter import converter
 from classes.WikifolioListItem import WikifolioListItem
 from classes.Wikifolio import Wikifolio
 from classes.Underlying import Underlying
@@ -14,6 +22,29 @@ from classes.OrderStatusResponse import OrderStatusResponse
 logger = logging.getLogger(__name__)
 coloredlogs.install(level='DEBUG', logger=logger, fmt='[%(asctime)s] %(levelname)s %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
 
+OrderStatus = Literal['Inactive', 'Waiting', 'Active', 'Evaluating', 'Executing', 'RequestingExecutionInformation', 'PartiallyExecutedActive', 'Executed', 'PartiallyExecutedExecuted', 'Deleted', 'DeleteRequested', 'Updated', 'Obsolete', 'Error', 'Rejected', 'Undone', 'Abandoned']
+_VALID_ORDER_STATUSES = frozenset(get_args(OrderStatus))
+_MAX_WORKERS = 8
+
+def _order_params(status: Optional[OrderStatus]) -> dict:
+    """Build the query parameters for listing orders
+
+    Args:
+        status (Optional[OrderStatus]): The order status to filter by, invalid statuses are logged and ignored
+
+    Returns:
+        dict: The query parameters
+    """
+    params = {}
+    if status:
+        logger.debug('Filtering orders by status: %s', status)
+        if status in _VALID_ORDER_STATUSES:
+            params['status'] = status
+        else:
+            logger.error('Invalid order status: %s, ignoring filter', status)
+    
+    return params
+
 @dataclasses.dataclass
 class WikifolioTradingAPI():
     clientApiKey: str
@@ -25,52 +56,138 @@ class WikifolioTradingAPI():
             'clientApiKey': self.clientApiKey,
             'userApiKey': self.userApiKey
         }
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=10))
         logger.info('Getting session token')
-        r = requests.post('https://trading-api.wikifolio.com/v1/sessions', headers=headers)
+        r = self.session.post('https://trading-api.wikifolio.com/v1/sessions', headers=headers)
         r.raise_for_status()
-        logger.debug(f'Session token: {r.json()["sessionToken"]}')
-        self.sessionToken = r.json()['sessionToken']
+        self.sessionToken = orjson.loads(r.content)['sessionToken']
+        logger.debug('Session token: %s', self.sessionToken)
+        self.session.headers.update({
+            'accept': 'application/json',
+            'Accept-Encoding': 'gzip, br',
+            'sessionToken': self.sessionToken
+        })
+        self._cache = TTLCache(maxsize=512, ttl=60)
+        # bodies kept for ETag revalidation outlive the 60 s cache, but only for 10 minutes
+        self._etags = TTLCache(maxsize=512, ttl=600)
+        self._cacheLock = threading.Lock()
         
     def logout(self) -> None:
         """Logout
         """
-        headers = {
-            'accept': 'application/json',
-            'sessionToken': self.sessionToken
-        }
         logger.info('Logging out')
-        r = requests.delete('https://trading-api.wikifolio.com/v1/sessions', headers=headers)
-        r.raise_for_status()
+        try:
+            r = self.session.delete('https://trading-api.wikifolio.com/v1/sessions')
+            r.raise_for_status()
+        finally:
+            self.session.close()
+            with self._cacheLock:
+                self._cache.clear()
+                self._etags.clear()
         logger.info('Logged out')
         
+    def invalidate(self) -> None:
+        """Clear the response cache of the read-only GET endpoints
+
+        The bodies kept for ETag revalidation are not cleared, so later calls still send If-None-Match and reuse them on 304 Not Modified. They expire after 10 minutes and are dropped on logout.
+        """
+        with self._cacheLock:
+            self._cache.clear()
+        
+    def _get(self, url: str, params: Optional[dict] = None, cached: bool = False) -> dict:
+        """GET an endpoint and return the parsed response body
+
+        Args:
+            url (str): The endpoint URL
+            params (Optional[dict]): The query parameters. Defaults to None.
+            cached (bool): Serve the body from the TTL cache if it was fetched within the last minute, otherwise revalidate it with its ETag. Defaults to False.
+
+        Returns:
+            dict: The parsed response body
+        """
+        params = params or {}
+        etag = None
+        if cached:
+            key = hashlib.blake2b(f'{url}?{urlencode(sorted(params.items()))}'.encode()).digest()
+            with self._cacheLock:
+                body = self._cache.get(key)
+                etag = self._etags.get(key)
+            if body is not None:
+                logger.debug('Cache hit for %s %s', url, params)
+                return body
+        r = self.session.get(url, params=params, headers={'If-None-Match': etag[0]} if etag else None)
+        if etag and r.status_code == 304:
+            logger.debug('Not modified: %s %s', url, params)
+            body = etag[1]
+        else:
+            r.raise_for_status()
+            body = orjson.loads(r.content)
+        if cached:
+            with self._cacheLock:
+                self._cache[key] = body
+                if 'ETag' in r.headers:
+                    self._etags[key] = (r.headers['ETag'], body)
+        
+        return body
+        
+    def _paginate(self, url: str, data_class: Optional[type], description: str, params: Optional[dict] = None, cached: bool = False) -> list:
+        """Fetch all pages of a paginated endpoint
+
+        The first page is fetched on its own to learn the number of pages, the remaining pages are fetched concurrently over the shared session and converted in page order as they arrive. At most _MAX_WORKERS pages are requested ahead of the one being converted, so uncached endpoints never hold more raw pages than that.
+
+        Args:
+            url (str): The endpoint URL
+            data_class (Optional[type]): The dataclass to convert each result to, None to return the raw dicts
+            description (str): What is being fetched, used for logging
+            params (Optional[dict]): Additional query parameters. Defaults to None.
+            cached (bool): Serve pages from the TTL cache. Defaults to False.
+
+        Returns:
+            list: A list of data_class instances, or of dicts if data_class is None
+        """
+        def convert(page: list) -> list:
+            return converter.structure(page, List[data_class]) if data_class else list(page)
+        
+        params = params or {}
+        logger.info('Getting %s, page 1', description)
+        body = self._get(url, {**params, 'pageNumber': 1}, cached)
+        totalPages = body['totalPages']
+        logger.info('Found %d pages of %s', totalPages, description)
+        logger.info('Found %d %s on page 1', len(body['results']), description)
+        with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as executor:
+            def submit(pageNumber: int) -> Future:
+                return executor.submit(self._get, url, {**params, 'pageNumber': pageNumber}, cached)
+            
+            futures = deque(submit(pageNumber) for pageNumber in range(2, min(totalPages, _MAX_WORKERS + 1) + 1))
+            # each page is converted while the following pages are still being fetched
+            results = convert(body['results'])
+            del body
+            for pageNumber in range(2, totalPages + 1):
+                page = futures.popleft().result()['results']
+                # top the window up again, so no more than _MAX_WORKERS pages are outstanding
+                if pageNumber + _MAX_WORKERS <= totalPages:
+                    futures.append(submit(pageNumber + _MAX_WORKERS))
+                logger.info('Found %d %s on page %d', len(page), description, pageNumber)
+                results.extend(convert(page))
+        
+        return results
+    
+    def list_wikifolios_raw(self) -> List[dict]:
+        """List wikifolios without converting them to dataclasses
+
+        Returns:
+            List[dict]: A list of wikifolios freshly fetched from the API, bypassing the response cache, so the caller owns the dicts
+        """
+        return self._paginate('https://trading-api.wikifolio.com/v1/wikifolios', None, 'wikifolios')
+    
     def list_wikifolios(self) -> List[WikifolioListItem]:
         """List wikifolios
 
         Returns:
             List[WikifolioListItem]: A list of wikifolios
         """
-        headers = {
-            'accept': 'application/json',
-            'sessionToken': self.sessionToken
-        }
-        params = {
-            'pageNumber': 1
-        }
-        list_wikifolios = []
-        logger.info(f'Getting wikifolios, page {params["pageNumber"]}')
-        r = requests.get('https://trading-api.wikifolio.com/v1/wikifolios', headers=headers, params=params)
-        r.raise_for_status()
-        logger.info(f'Found {r.json()["totalPages"]} pages of wikifolios')
-        logger.info(f'Found {len(r.json()["results"])} wikifolios on page {params["pageNumber"]}')
-        list_wikifolios += r.json()['results']
-        while r.json()['pageNumber'] < r.json()['totalPages']:
-            params['pageNumber'] += 1
-            r = requests.get('https://trading-api.wikifolio.com/v1/wikifolios', headers=headers, params=params)
-            r.raise_for_status()
-            logger.info(f'Found {len(r.json()["results"])} wikifolios on page {params["pageNumber"]}')
-            list_wikifolios += r.json()['results']
-        
-        return [from_dict(data_class=WikifolioListItem, data=wikifolio) for wikifolio in list_wikifolios]
+        return self._paginate('https://trading-api.wikifolio.com/v1/wikifolios', WikifolioListItem, 'wikifolios', cached=True)
     
     def get_wikifolio(self, wikifolioSymbol: str) -> Wikifolio:
         """Get a wikifolio
@@ -81,15 +198,21 @@ class WikifolioTradingAPI():
         Returns:
             Wikifolio: The wikifolio
         """
-        headers = {
-            'accept': 'application/json',
-            'sessionToken': self.sessionToken
-        }
-        logger.info(f'Getting wikifolio {wikifolioSymbol}')
-        r = requests.get(f'https://trading-api.wikifolio.com/v1/wikifolios/{wikifolioSymbol}', headers=headers)
-        r.raise_for_status()
+        logger.info('Getting wikifolio %s', wikifolioSymbol)
+        body = self._get(f'https://trading-api.wikifolio.com/v1/wikifolios/{wikifolioSymbol}', cached=True)
         
-        return from_dict(data_class=Wikifolio, data=r.json())
+        return converter.structure(body, Wikifolio)
+    
+    def list_wikifolio_underlyings_raw(self, wikifolioSymbol: str) -> List[dict]:
+        """List underlyings for a wikifolio without converting them to dataclasses
+
+        Args:
+            wikifolioSymbol (str): The wikifolio symbol
+
+        Returns:
+            List[dict]: A list of underlyings freshly fetched from the API, bypassing the response cache, so the caller owns the dicts
+        """
+        return self._paginate(f'https://trading-api.wikifolio.com/v1/wikifolios/{wikifolioSymbol}/underlyings', None, f'underlyings for {wikifolioSymbol}')
     
     def list_wikifolio_underlyings(self, wikifolioSymbol: str) -> List[Underlying]:
         """List underlyings for a wikifolio
@@ -100,70 +223,31 @@ class WikifolioTradingAPI():
         Returns:
             List[Underlying]: A list of underlyings
         """
-        headers = {
-            'accept': 'application/json',
-            'sessionToken': self.sessionToken
-        }
-        params = {
-            'pageNumber': 1
-        }
-        list_underlyings = []
-        logger.info(f'Getting underlyings for {wikifolioSymbol}, page {params["pageNumber"]}')
-        r = requests.get(f'https://trading-api.wikifolio.com/v1/wikifolios/{wikifolioSymbol}/underlyings', headers=headers, params=params)
-        r.raise_for_status()
-        logger.info(f'Found {r.json()["totalPages"]} pages of underlyings for {wikifolioSymbol}')
-        logger.info(f'Found {len(r.json()["results"])} underlyings for {wikifolioSymbol} on page {params["pageNumber"]}')
-        list_underlyings += r.json()['results']
-        while r.json()['pageNumber'] < r.json()['totalPages']:
-            params['pageNumber'] += 1
-            logger.info(f'Getting underlyings for {wikifolioSymbol}, page {params["pageNumber"]}')
-            r = requests.get(f'https://trading-api.wikifolio.com/v1/wikifolios/{wikifolioSymbol}/underlyings', headers=headers, params=params)
-            r.raise_for_status()
-            logger.info(f'Found {len(r.json()["results"])} underlyings for {wikifolioSymbol} on page {params["pageNumber"]}')
-            list_underlyings += r.json()['results']
-        
-        return [from_dict(data_class=Underlying, data=underlying) for underlying in list_underlyings]
+        return self._paginate(f'https://trading-api.wikifolio.com/v1/wikifolios/{wikifolioSymbol}/underlyings', Underlying, f'underlyings for {wikifolioSymbol}', cached=True)
     
-    def list_wikifolio_orders(self, wikifolioSymbol: str, status: Optional[str] = None) -> List[OrderStatusResponse]:
+    def list_wikifolio_orders_raw(self, wikifolioSymbol: str, status: Optional[OrderStatus] = None) -> List[dict]:
+        """List orders for a wikifolio without converting them to dataclasses
+
+        Args:
+            wikifolioSymbol (str): The wikifolio symbol
+            status (Optional[OrderStatus]): The order status to filter by. Defaults to None. Possible values: 'Inactive', 'Waiting', 'Active', 'Evaluating', 'Executing', 'RequestingExecutionInformation', 'PartiallyExecutedActive', 'Executed', 'PartiallyExecutedExecuted', 'Deleted', 'DeleteRequested', 'Updated', 'Obsolete', 'Error', 'Rejected', 'Undone', 'Abandoned'
+
+        Returns:
+            List[dict]: A list of orders as returned by the API
+        """
+        return self._paginate(f'https://trading-api.wikifolio.com/v1/wikifolios/{wikifolioSymbol}/orders', None, f'orders for {wikifolioSymbol}', _order_params(status))
+    
+    def list_wikifolio_orders(self, wikifolioSymbol: str, status: Optional[OrderStatus] = None) -> List[OrderStatusResponse]:
         """List orders for a wikifolio
 
         Args:
             wikifolioSymbol (str): The wikifolio symbol
-            status (Optional[str]): The order status to filter by. Defaults to None. Possible values: 'Inactive', 'Waiting', 'Active', 'Evaluating', 'Executing', 'RequestingExecutionInformation', 'PartiallyExecutedActive', 'Executed', 'PartiallyExecutedExecuted', 'Deleted', 'DeleteRequested', 'Updated', 'Obsolete', 'Error', 'Rejected', 'Undone', 'Abandoned'
+            status (Optional[OrderStatus]): The order status to filter by. Defaults to None. Possible values: 'Inactive', 'Waiting', 'Active', 'Evaluating', 'Executing', 'RequestingExecutionInformation', 'PartiallyExecutedActive', 'Executed', 'PartiallyExecutedExecuted', 'Deleted', 'DeleteRequested', 'Updated', 'Obsolete', 'Error', 'Rejected', 'Undone', 'Abandoned'
 
         Returns:
             List[OrderStatusResponse]: A list of orders
         """
-        headers = {
-            'accept': 'application/json',
-            'sessionToken': self.sessionToken
-        }
-        params = {
-            'pageNumber': 1
-        }
-        if status:
-            logger.debug(f'Filtering orders by status: {status}')
-            if status in ['Inactive', 'Waiting', 'Active', 'Evaluating', 'Executing', 'RequestingExecutionInformation', 'PartiallyExecutedActive', 'Executed', 'PartiallyExecutedExecuted', 'Deleted', 'DeleteRequested', 'Updated', 'Obsolete', 'Error', 'Rejected', 'Undone', 'Abandoned']:
-                params['status'] = status
-            else:
-                logger.error(f'Invalid order status: {status}, ignoring filter')
-                del params['status']
-        list_orders = []
-        logger.info(f'Getting orders for {wikifolioSymbol}, page {params["pageNumber"]}')
-        r = requests.get(f'https://trading-api.wikifolio.com/v1/wikifolios/{wikifolioSymbol}/orders', headers=headers, params=params)
-        r.raise_for_status()
-        logger.info(f'Found {r.json()["totalPages"]} pages of orders for {wikifolioSymbol}')
-        logger.info(f'Found {len(r.json()["results"])} orders for {wikifolioSymbol} on page {params["pageNumber"]}')
-        list_orders += r.json()['results']
-        while r.json()['pageNumber'] < r.json()['totalPages']:
-            params['pageNumber'] += 1
-            logger.info(f'Getting orders for {wikifolioSymbol}, page {params["pageNumber"]}')
-            r = requests.get(f'https://trading-api.wikifolio.com/v1/wikifolios/{wikifolioSymbol}/orders', headers=headers, params=params)
-            r.raise_for_status()
-            logger.info(f'Found {len(r.json()["results"])} orders for {wikifolioSymbol} on page {params["pageNumber"]}')
-            list_orders += r.json()['results']
-        
-        return [from_dict(data_class=OrderStatusResponse, data=order) for order in list_orders]
+        return self._paginate(f'https://trading-api.wikifolio.com/v1/wikifolios/{wikifolioSymbol}/orders', OrderStatusResponse, f'orders for {wikifolioSymbol}', _order_params(status))
     
     def place_limit_order(self, wikifolioSymbol: str, underlying: str, amount: int, limitPrice: float, validUntilDate: datetime.date, side: str, stopPrice: Optional[float] = None) -> str:
         """Place a limit order
@@ -182,7 +266,7 @@ class WikifolioTradingAPI():
         """
         side = side.lower()
         if side not in ['buy', 'sell']:
-            logger.error(f'Invalid side: {side}, must be "buy" or "sell"')
+            logger.error('Invalid side: %s, must be "buy" or "sell"', side)
             return
         if side == 'sell' and stopPrice:
             logger.error('Stop price is only allowed for buy orders')
@@ -194,10 +278,6 @@ class WikifolioTradingAPI():
         elif side == 'sell':
             orderType = 'SellLimit'
             
-        headers = {
-            'accept': 'application/json',
-            'sessionToken': self.sessionToken
-        }
         data = {
             'wikifolioSymbol': wikifolioSymbol,
             'underlying': underlying,
@@ -209,14 +289,15 @@ class WikifolioTradingAPI():
         if stopPrice:
             data['stopPrice'] = stopPrice
         
-        logger.debug(f'Data for limit order: {data}')    
-        logger.info(f'Placing limit order for {wikifolioSymbol}')
-        r = requests.post(f'https://trading-api.wikifolio.com/v1/limitorders', headers=headers, json=data)
-        logger.debug(f'Limit order response: {r.text}')
+        logger.debug('Data for limit order: %s', data)    
+        logger.info('Placing limit order for %s', wikifolioSymbol)
+        r = self.session.post(f'https://trading-api.wikifolio.com/v1/limitorders', json=data)
+        logger.debug('Limit order response: %s', r.text)
         r.raise_for_status()
-        logger.info(f'Placed limit order for {wikifolioSymbol}')
+        self.invalidate()
+        logger.info('Placed limit order for %s', wikifolioSymbol)
         
-        return r.json()['orderId']
+        return orjson.loads(r.content)['orderId']
     
     def update_limit_order(self, orderId: str, limitPrice: float, amount: int, validUntilDate: datetime.date, stopPrice: Optional[float] = None) -> None:
         """Update a limit order
@@ -228,10 +309,6 @@ class WikifolioTradingAPI():
             validUntilDate (datetime.date): The valid until date, this can't go too far into the future, not sure how far
             stopPrice (Optional[float]): The stop price. Defaults to None.
         """
-        headers = {
-            'accept': 'application/json',
-            'sessionToken': self.sessionToken
-        }
         data = {
             'limitPrice': limitPrice,
             'amount': amount,
@@ -240,12 +317,13 @@ class WikifolioTradingAPI():
         if stopPrice:
             data['stopPrice'] = stopPrice
         
-        logger.debug(f'Data for updating limit order: {data}')    
-        logger.info(f'Updating limit order {orderId}')
-        r = requests.put(f'https://trading-api.wikifolio.com/v1/limitorders/{orderId}', headers=headers, json=data)
-        logger.debug(f'Update limit order response: {r.text}')
+        logger.debug('Data for updating limit order: %s', data)    
+        logger.info('Updating limit order %s', orderId)
+        r = self.session.put(f'https://trading-api.wikifolio.com/v1/limitorders/{orderId}', json=data)
+        logger.debug('Update limit order response: %s', r.text)
         r.raise_for_status()
-        logger.info(f'Updated limit order {orderId}')
+        self.invalidate()
+        logger.info('Updated limit order %s', orderId)
         
     def delete_limit_order(self, orderId: str) -> None:
         """Delete a limit order
@@ -253,15 +331,12 @@ class WikifolioTradingAPI():
         Args:
             orderId (str): The order ID
         """
-        headers = {
-            'accept': 'application/json',
-            'sessionToken': self.sessionToken
-        }
-        logger.info(f'Deleting limit order {orderId}')
-        r = requests.delete(f'https://trading-api.wikifolio.com/v1/limitorders/{orderId}', headers=headers)
-        logger.debug(f'Delete limit order response: {r.text}')
+        logger.info('Deleting limit order %s', orderId)
+        r = self.session.delete(f'https://trading-api.wikifolio.com/v1/limitorders/{orderId}')
+        logger.debug('Delete limit order response: %s', r.text)
         r.raise_for_status()
-        logger.info(f'Deleted limit order {orderId}')
+        self.invalidate()
+        logger.info('Deleted limit order %s', orderId)
         
     def get_limit_order(self, orderId: str) -> OrderStatusResponse:
         """Get a limit order
@@ -272,15 +347,10 @@ class WikifolioTradingAPI():
         Returns:
             OrderStatusResponse: The order
         """
-        headers = {
-            'accept': 'application/json',
-            'sessionToken': self.sessionToken
-        }
-        logger.info(f'Getting limit order {orderId}')
-        r = requests.get(f'https://trading-api.wikifolio.com/v1/limitorders/{orderId}', headers=headers)
-        r.raise_for_status()
+        logger.info('Getting limit order %s', orderId)
+        body = self._get(f'https://trading-api.wikifolio.com/v1/limitorders/{orderId}')
         
-        return from_dict(data_class=OrderStatusResponse, data=r.json())
+        return converter.structure(body, OrderStatusResponse)
     
     def place_quote_order(self, wikifolioSymbol: str, underlying: str, amount: int, side: str) -> str:
         """Place a quote order
@@ -299,17 +369,13 @@ class WikifolioTradingAPI():
         
         side = side.lower()
         if side not in ['buy', 'sell']:
-            logger.error(f'Invalid side: {side}, must be "buy" or "sell"')
+            logger.error('Invalid side: %s, must be "buy" or "sell"', side)
             return
         if side == 'buy':
             orderType = 'Buy'
         elif side == 'sell':
             orderType = 'Sell'
             
-        headers = {
-            'accept': 'application/json',
-            'sessionToken': self.sessionToken
-        }
         data = {
             'wikifolioSymbol': wikifolioSymbol,
             'underlying': underlying,
@@ -317,23 +383,24 @@ class WikifolioTradingAPI():
             'orderType': orderType
         }
         
-        logger.debug(f'Data for quote: {data}')    
-        logger.info(f'Getting quote for {wikifolioSymbol}')
-        r = requests.post(f'https://trading-api.wikifolio.com/v1/quotes', headers=headers, json=data)
-        logger.debug(f'Quote response: {r.text}')
+        logger.debug('Data for quote: %s', data)    
+        logger.info('Getting quote for %s', wikifolioSymbol)
+        r = self.session.post(f'https://trading-api.wikifolio.com/v1/quotes', json=data)
+        logger.debug('Quote response: %s', r.text)
         r.raise_for_status()
-        logger.info(f'Got quote for {wikifolioSymbol}')
+        logger.info('Got quote for %s', wikifolioSymbol)
         
         # Step 2: place order
-        quoteId = r.json()['quoteId']
+        quoteId = orjson.loads(r.content)['quoteId']
         data = {
             'quoteId': quoteId
         }
-        logger.info(f'Placing quote order for {wikifolioSymbol}')
-        r = requests.post(f'https://trading-api.wikifolio.com/v1/quoteorders', headers=headers, json=data)
-        logger.debug(f'Quote order response: {r.text}')
+        logger.info('Placing quote order for %s', wikifolioSymbol)
+        r = self.session.post(f'https://trading-api.wikifolio.com/v1/quoteorders', json=data)
+        logger.debug('Quote order response: %s', r.text)
         r.raise_for_status()
-        logger.info(f'Placed quote order for {wikifolioSymbol}')
+        self.invalidate()
+        logger.info('Placed quote order for %s', wikifolioSymbol)
         
-        return r.json()['orderId']
+        return orjson.loads(r.content)['orderId']
         
\ No newline at end of file